@@ -3,3 +3,5 @@ from ninjapie.generator import BuildEdge, Generator, Rule
 from ninjapie.path import BuildPath, SourcePath
 
 from .version import __version__
+
+__all__ = ['Env', 'Generator', 'Rule', 'BuildEdge', 'BuildPath', 'SourcePath', '__version__']
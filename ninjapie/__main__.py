@@ -1,6 +1,6 @@
 import argparse
-from glob import glob
 import os
+import re
 import subprocess
 import sys
 
@@ -9,18 +9,159 @@ with open(os.path.dirname(__file__) + '/version.py', encoding='utf-8') as vfile:
     exec(vfile.read())  # pylint: disable=W0122
 
 
+# matches path components that contain wildcards
+_MAGIC = re.compile(b'[*?[]')
+# matches any number of non-hidden directories, as '**' does
+_ANY_DIRS = b'(?:(?!\\.)[^/]+/)*'
+
+
+def _translate(component):
+    """
+    Translates the given path component of a glob pattern into a regular expression
+
+    Like glob, wildcards never match a '/' and names starting with a '.' are only matched if the
+    component starts with a '.' as well.
+    """
+
+    if component == b'**':
+        return _ANY_DIRS
+    if not _MAGIC.search(component):
+        return re.escape(component) + b'/'
+
+    res = b'' if component.startswith(b'.') else b'(?!\\.)'
+    i = 0
+    while i < len(component):
+        char = component[i:i + 1]
+        i += 1
+        if char == b'*':
+            res += b'[^/]*'
+        elif char == b'?':
+            res += b'[^/]'
+        elif char == b'[':
+            # a leading '!' negates the class and a leading ']' is taken literally
+            start = i + 1 if component[i:i + 1] == b'!' else i
+            start += 1 if component[start:start + 1] == b']' else 0
+            end = component.find(b']', start)
+            if end == -1:
+                res += b'\\['
+                continue
+            # like fnmatch.translate, escape the characters with a special meaning in classes
+            chars = re.sub(b'([&~|])', b'\\\\\\1', component[i:end].replace(b'\\', b'\\\\'))
+            if chars.startswith(b'!'):
+                chars = b'^' + chars[1:]
+            elif chars.startswith((b'^', b'[')):
+                chars = b'\\' + chars
+            res += b'[' + chars + b']'
+            i = end + 1
+        else:
+            res += re.escape(char)
+    return res + b'/'
+
+
+def _compile(components):
+    """
+    Compiles the given path components of a glob pattern into two regular expressions
+
+    Both are matched against paths relative to the root directory of the pattern. The first one is
+    matched against all entries, whereas the second one is matched against directories followed by
+    a '/' (the root itself being the empty path). Like glob, the directories are reported with a
+    trailing '/' for patterns that end with a '/' or '**'. Either regular expression is `None` if
+    it cannot match.
+    """
+
+    dirs = b''.join(_translate(c) for c in components[:-1])
+    if components[-1] == b'':
+        # a trailing '/' matches only directories
+        return None, dirs
+    if components[-1] == b'**':
+        # a trailing '**' matches the directories themselves and all files and directories below
+        return dirs + _ANY_DIRS + b'(?!\\.)[^/]+', dirs
+    return dirs + _translate(components[-1])[:-1], None
+
+
+def _union(regexes):
+    """
+    Compiles the alternation of the given regular expressions, ignoring the `None` entries
+    """
+
+    regexes = [b'(?:' + r + b')' for r in regexes if r is not None]
+    return re.compile(b'|'.join(regexes)) if regexes else None
+
+
+def _expand(root, patterns):
+    """
+    Returns all files below `root` that match any of the given patterns
+
+    `patterns` is a tuple with the path components of each pattern after `root`. Instead of walking
+    the directory tree once per pattern as glob does, the tree is walked only once and all entries
+    are matched against the union of all patterns. The results are not cached, because the second
+    call of `all_files` after running build.py needs to see the files that appeared in between.
+    """
+
+    regex, dir_regex = (_union(r) for r in zip(*(_compile(p) for p in patterns)))
+    # how deep we need to descend (a trailing '/' does not add a level) and whether we need to look
+    # into hidden directories
+    max_depth = max(len(p) - (p[-1] == b'') if b'**' not in p else sys.maxsize for p in patterns)
+    hidden = any(c.startswith(b'.') for p in patterns for c in p)
+
+    prefix = b'' if root == b'' else root if root.endswith(b'/') else root + b'/'
+    root = root or b'.'
+    skip = len(root) if root.endswith(b'/') else len(root) + 1
+    # like glob, the root itself is included, unless it is the current directory
+    files = [prefix] if prefix and dir_regex and dir_regex.fullmatch(b'') and os.path.isdir(root) \
+        else []
+    # like glob, follow symlinks to directories
+    for dirpath, dirnames, filenames in os.walk(root, followlinks=True):
+        rel_dir = dirpath[skip:]
+        if not hidden:
+            dirnames[:] = [d for d in dirnames if not d.startswith(b'.')]
+        for name in dirnames:
+            rel = rel_dir + b'/' + name if rel_dir else name
+            if regex and regex.fullmatch(rel):
+                files.append(prefix + rel)
+            if dir_regex and dir_regex.fullmatch(rel + b'/'):
+                files.append(prefix + rel + b'/')
+        if regex:
+            for name in filenames:
+                rel = rel_dir + b'/' + name if rel_dir else name
+                if regex.fullmatch(rel):
+                    files.append(prefix + rel)
+        # stop descending once we reached the depth of the deepest pattern
+        if (rel_dir.count(b'/') + 2 if rel_dir else 1) >= max_depth:
+            dirnames.clear()
+    return tuple(files)
+
+
 def all_files(build_dir):
-    """Collects a string with all files found by the patters in the globs file"""
+    """
+    Collects all files found by the patterns in the globs file
 
-    files = ''
+    The patterns and the found files are kept as bytes, which allows us to skip the decoding of
+    every directory entry.
+    """
+
+    # group the patterns by the directory in front of the first wildcard so that we walk each
+    # directory only once
+    roots = {}
+    files = []
     try:
-        with open(build_dir + '/.build.globs', 'r', encoding='utf-8') as file:
+        with open(build_dir + '/.build.globs', 'rb') as file:
             for line in file.readlines():
-                files += '\n'.join(glob(line.strip(), recursive=True))
-                files += '\n'
+                components = line.strip().split(b'/')
+                idx = next((i for i, c in enumerate(components) if _MAGIC.search(c)), None)
+                if idx is None:
+                    # without wildcards, only check for existence like glob does
+                    if os.path.lexists(line.strip()):
+                        files.append(line.strip())
+                    continue
+                root = b'/'.join(components[:idx]) or (b'/' if idx > 0 else b'')
+                roots.setdefault(root, []).append(tuple(components[idx:]))
     except FileNotFoundError:
         pass
-    return files
+
+    for root, patterns in roots.items():
+        files += _expand(root, tuple(patterns))
+    return b''.join(f + b'\n' for f in files)
 
 
 def clean(build_dir, _args, _ninja_args):
@@ -47,19 +188,27 @@ def build(build_dir, args, ninja_args):
     all_files_path = build_dir + '/.build.files'
     build_file = build_dir + '/build.ninja'
 
-    # export PYTHONPATH to find the ninjapie modules
-    python_path = os.environ.setdefault('PYTHONPATH', '')
-    os.environ['PYTHONPATH'] = root_dir + ': ' + python_path
+    # export PYTHONPATH to find the ninjapie modules. This is not only required for our own build.py
+    # invocation below, but also for ninja, which reruns build.py whenever a build.py changed.
+    # Therefore, only skip it if the environment already contains our path.
+    python_path = os.environ.get('PYTHONPATH')
+    if python_path is None:
+        os.environ['PYTHONPATH'] = root_dir
+    elif root_dir not in python_path.split(':'):
+        os.environ['PYTHONPATH'] = root_dir + ':' + python_path
 
     # check if we need to reconfigure
     if not reconf:
         try:
             # check whether files have been added or removed
-            with open(all_files_path, 'r', encoding='utf-8') as file:
-                old_files = file.read()
             new_files = all_files(build_dir)
-            # if the list of files changed, we need to reconfigure
-            reconf = old_files != new_files
+            # if the list of files changed, we need to reconfigure. Comparing the sizes first
+            # saves us from reading the old list in the common case of added or removed files.
+            if os.path.getsize(all_files_path) != len(new_files):
+                reconf = True
+            else:
+                with open(all_files_path, 'rb') as file:
+                    reconf = file.read() != new_files
         except FileNotFoundError:
             reconf = True
 
@@ -76,24 +225,26 @@ def build(build_dir, args, ninja_args):
 
         # store new list of files from globs
         new_files = all_files(build_dir)
-        with open(all_files_path, 'w', encoding='utf-8') as file:
+        with open(all_files_path, 'wb') as file:
             file.write(new_files)
 
-    # now build everything with ninja
+    # now build everything with ninja. We cannot simply exec ninja, because we need to clean up in
+    # case it fails, but we can propagate its exit code instead of raising an exception for it.
+    # ninja's output is redirected to stderr by passing fd 2 directly.
     try:
-        subprocess.check_call(['ninja', '-f', build_file] + ninja_args, stdout=sys.stderr.buffer)
+        res = subprocess.call(['ninja', '-f', build_file] + ninja_args, stdout=2)
     except KeyboardInterrupt:
+        res = 1
+    except Exception as exc:  # pylint: disable=W0718
+        print("Running ninja failed:", exc)
+        res = 1
+
+    if res != 0:
         # ensure that we regenerate the build.ninja next time. Since ninja does not accept the
         # build.ninja, it will also not detect changes our build files in order to regenerate it.
         # Therefore, force a regenerate next time by removing the file.
         os.remove(all_files_path)
-        return 1
-    except Exception as exc:  # pylint: disable=W0718
-        print("Running ninja failed:", exc)
-        os.remove(all_files_path)
-        return 1
-
-    return 0
+    return res
 
 
 def main(argv=None):
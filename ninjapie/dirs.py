@@ -0,0 +1,75 @@
+import fnmatch
+import os
+import re
+
+# matches patterns that contain wildcards
+_MAGIC = re.compile('[*?[]')
+
+
+def listdir(cache: dict, dir: str, dironly: bool) -> list[str]:
+    """
+    Returns the names of the entries in the given directory (only directories if `dironly`)
+
+    The directory is only read on the first call; afterwards the entries are taken from `cache`.
+    """
+
+    entries = cache.get(dir)
+    if entries is None:
+        try:
+            with os.scandir(dir or os.curdir) as it:
+                entries = [(e.name, e.is_dir()) for e in it]
+        except OSError:
+            entries = []
+        cache[dir] = entries
+    return [name for name, is_dir in entries if is_dir or not dironly]
+
+
+def _rlistdir(cache: dict, dir: str, dironly: bool):
+    """
+    Yields the paths of all non-hidden entries below the given directory, relative to it
+    """
+
+    for name in listdir(cache, dir, dironly):
+        if not name.startswith('.'):
+            yield name
+            for sub in _rlistdir(cache, os.path.join(dir, name), dironly):
+                yield os.path.join(name, sub)
+
+
+def iglob(cache: dict, pattern: str, dironly: bool = False):
+    """
+    Yields the paths that match the given pattern in the same order as `glob.iglob` does
+
+    This follows the algorithm of `glob.iglob` with `recursive=True`, but reads every directory
+    only once via `listdir`, so that multiple patterns within the same directory tree do not walk
+    it again.
+    """
+
+    dirname, basename = os.path.split(pattern)
+    if not _MAGIC.search(pattern):
+        if os.path.lexists(pattern) if basename else os.path.isdir(dirname):
+            yield pattern
+        return
+
+    if dirname != pattern and _MAGIC.search(dirname):
+        dirs = iglob(cache, dirname, True)
+    else:
+        dirs = [dirname]
+
+    for dir in dirs:
+        if basename == '**':
+            # like glob, only include the directory itself if it is not the current one
+            names = list(_rlistdir(cache, dir, dironly))
+            if dir or dironly:
+                names.insert(0, '')
+        elif _MAGIC.search(basename):
+            names = listdir(cache, dir, dironly)
+            if not basename.startswith('.'):
+                names = [n for n in names if not n.startswith('.')]
+            names = fnmatch.filter(names, basename)
+        elif os.path.lexists(os.path.join(dir, basename)) if basename else os.path.isdir(dir):
+            names = [basename]
+        else:
+            names = []
+        for name in names:
+            yield os.path.join(dir, name)
@@ -1,13 +1,31 @@
-import copy
-from glob import glob
-import importlib.util
-from pathlib import Path
+# pylint: disable=C0302
+from collections import Counter
+import itertools
 import os
 import sys
 
+from ninjapie.dirs import iglob
 from ninjapie.path import BuildPath, SourcePath
 from ninjapie.generator import BuildEdge, Generator
 
+# the method of `Env` that builds files with a given extension in `Env.objs`. Files with an empty
+# method name are already built and taken as they are.
+_EXT_DISPATCH = {
+    '.S': 'asm',
+    '.s': 'asm',
+    '.c': 'cc',
+    '.cc': 'cxx',
+    '.cpp': 'cxx',
+    '.o': '',
+    '.a': '',
+    '.so': '',
+}
+# the methods that `Env.objs` dispatches to and the flag variable each of them uses
+_OBJ_METHODS = ('asm', 'cc', 'cxx')
+_OBJ_FLAGS = {'asm': 'ASFLAGS', 'cc': 'CFLAGS', 'cxx': 'CXXFLAGS'}
+# returned by `Env._cached` if there is no up-to-date value
+_UNCACHED = object()
+
 
 class Env:
     """
@@ -30,9 +48,36 @@ class Env:
     ... gen.write_to_file()
     """
 
+    __slots__ = ('_id', '_cwd', '_build_dir', '_vars', '_owned', '_escaped', '_derived',
+                 '_flags_version')
+
     class _Location:
+        # the path is kept as a list of directories that is only joined on demand, so that entering
+        # and leaving subdirectories does not copy the whole path each time
+        __slots__ = ('_parts', '_path')
+
         def __init__(self, path: str):
-            self.path = path
+            self._parts = [path]
+            self._path = path
+
+        @property
+        def path(self) -> str:
+            if self._path is None:
+                self._path = '/'.join(self._parts)
+            return self._path
+
+        def push(self, dir: str):
+            self._parts.append(dir)
+            self._path = None
+
+        def pop(self):
+            self._parts.pop()
+            self._path = None
+
+    # absolute paths of the Rust target directories, indexed by build directory and `RUSTOUT`
+    _abspath_cache = {}
+    # the build functions of the already imported build.py files, indexed by their directory
+    _sub_build_cache = {}
 
     def __init__(self):
         """
@@ -46,6 +91,10 @@ class Env:
         self._cwd = Env._Location('.')
         self._build_dir = os.environ.get('NPBUILD')
         self._vars = {}
+        # values derived from the variables (joined flag strings etc.) and the version of the
+        # variables they have been built from (see `Env._cached`)
+        self._derived = {}
+        self._flags_version = 0
 
         # default tools
         self._vars['CXX'] = 'g++'
@@ -77,12 +126,21 @@ class Env:
         self._vars['CRGFLAGS'] = []
         self._vars['CRGENV'] = {}
 
+        # the variables whose lists or dicts are not shared with any clone (see `Env._own`)
+        self._owned = set(self._vars)
+        # the variables whose lists or dicts are referenced outside of this `Env` as well, because
+        # they have been returned by `Env.__getitem__` or set via `Env.__setitem__`. these might be
+        # changed behind our back.
+        self._escaped = set()
+
     def clone(self):
         """
         Clones this environment to produce an independently changable copy.
 
         The clone can be used to change the variables of the environment in order to prepare for a
-        build edge with different settings without influencing other build edges.
+        build edge with different settings without influencing other build edges. This includes
+        lists and dicts that have been obtained via `Env.__getitem__` or set via `Env.__setitem__`
+        before: changes via these references only affect this environment, not the clone.
 
         An example usage looks like the following:
         >>> env['CFLAGS'] += ['-Wall', '-Wextra']
@@ -99,12 +157,43 @@ class Env:
         original environment is used to link the application.
         """
 
-        env = type(self)()
+        # bypass __init__, because we overwrite the defaults anyway. Subclasses might initialize
+        # their own attributes there, though, so call it for them.
+        cls = type(self)
+        env = cls.__new__(cls) if cls is Env else cls()
         env._id = self._id + 1
         env._cwd = self._cwd
-        env._vars = copy.deepcopy(self._vars)
+        env._build_dir = self._build_dir
+        env._derived = dict(self._derived)
+        env._flags_version = self._flags_version
+        # the lists and dicts are shared until either side changes them (copy on write). As clones
+        # often change only a few variables, if any, this saves us from copying all of them. This
+        # does not apply to escaped values, which might be changed via outside references.
+        env._vars = dict(self._vars)
+        for var in self._escaped:
+            env._vars[var] = self._vars[var].copy()
+        env._owned = set(self._escaped)
+        env._escaped = set()
+        self._owned &= self._escaped
         return env
 
+    def _own(self, var: str):
+        """
+        Returns the value of the given variable, ready to be changed in place
+
+        Lists and dicts are copied first if they are still shared with other clones.
+        """
+
+        value = self._vars[var]
+        if var not in self._owned:
+            if isinstance(value, list):
+                value = value[:]
+            elif isinstance(value, dict):
+                value = dict(value)
+            self._vars[var] = value
+            self._owned.add(var)
+        return value
+
     @property
     def cur_dir(self) -> str:
         """
@@ -135,18 +224,42 @@ class Env:
         The value of the variable
         """
 
-        return self._vars[var]
+        value = self._vars[var]
+        # the caller might change the returned list or dict in place, which must neither affect
+        # other clones nor our cached values
+        if isinstance(value, (list, dict)):
+            value = self._own(var)
+            self._escaped.add(var)
+            self._flags_version += 1
+        return value
 
     def __setitem__(self, var: str, value):
         """
         Sets the value or the variable with given name to `value`
 
+        Lists and dicts are not copied, so that changes via other references to `value` affect this
+        environment and vice versa. Clones created afterwards get their own copy, though.
+
         Parameters
         ----------
         :param var: the variable name
         :param value: the new value
         """
 
+        self._flags_version += 1
+        # tool names and similar strings end up in thousands of build edges; interning lets them
+        # share a single object and speeds up the comparisons when determining the defaults
+        # (only for exact strings, because sys.intern does not accept subclasses like SourcePath)
+        if type(value) is str:  # pylint: disable=C0123
+            value = sys.intern(value)
+        # the caller holds a reference to lists and dicts and we change them in place like the
+        # caller's, because clones copy them eagerly anyway
+        if isinstance(value, (list, dict)):
+            self._owned.add(var)
+            self._escaped.add(var)
+        else:
+            self._owned.discard(var)
+            self._escaped.discard(var)
         self._vars[var] = value
 
     def add_flag(self, var: str, flag: str):
@@ -182,7 +295,8 @@ class Env:
         """
 
         assert isinstance(self._vars[var], list)
-        self._vars[var] += flags
+        self._flags_version += 1
+        self._own(var).extend(flags)
 
     def remove_flag(self, var: str, flag: str):
         """
@@ -217,10 +331,109 @@ class Env:
         :param flags: the flags to remove
         """
 
-        for flag in flags:
-            assert isinstance(self._vars[var], list)
-            if flag in self._vars[var]:
-                self._vars[var].remove(flag)
+        if not flags:
+            return
+
+        assert isinstance(self._vars[var], list)
+        values = self._own(var)
+        self._flags_version += 1
+        # remove the first occurrence of each flag in a single pass over the list
+        pending = Counter(flags)
+        kept = []
+        for val in values:
+            if pending[val] > 0:
+                pending[val] -= 1
+            else:
+                kept.append(val)
+        values[:] = kept
+
+    def _cached(self, key: tuple):
+        """
+        Returns the value derived from the variables that has been stored for `key` via
+        `Env._store`, or `_UNCACHED` if there is none or any variable has been changed since then
+        """
+
+        entry = self._derived.get(key)
+        if entry is None or entry[0] != self._flags_version:
+            return _UNCACHED
+        # escaped variables might have been changed without us noticing, so compare their contents
+        for var, snapshot in entry[1]:
+            if self._vars[var] != snapshot:
+                return _UNCACHED
+        return entry[2]
+
+    def _store(self, key: tuple, vars: tuple[str, ...], value):
+        """
+        Stores the given value derived from the given variables for `key` and returns it
+        """
+
+        snapshots = [(var, self._vars[var].copy()) for var in vars if var in self._escaped]
+        self._derived[key] = (self._flags_version, snapshots, value)
+        return value
+
+    def _joined(self, keys: tuple[str, ...], prefix: str = '') -> str:
+        """
+        Returns the values of the given flag variables joined by spaces, each prefixed by `prefix`
+
+        The result is cached until any variable is changed.
+        """
+
+        key = ('joined', keys, prefix)
+        res = self._cached(key)
+        if res is not _UNCACHED:
+            return res
+        # chain the lists instead of concatenating them to avoid the temporary list
+        if len(keys) == 1:
+            flags = self._vars[keys[0]]
+        else:
+            flags = itertools.chain.from_iterable(self._vars[k] for k in keys)
+        if prefix:
+            flags = (prefix + f for f in flags)
+        # clones often end up with the same flags, so let them share the string
+        return self._store(key, keys, sys.intern(' '.join(flags)))
+
+    def _source_path(self, gen: Generator, path) -> SourcePath:
+        """
+        Returns `SourcePath.new(self, path)`, reusing the object created for the same path before
+        """
+
+        # the result also depends on the type, because `str` is relative to the current directory
+        key = (SourcePath, self.cur_dir, type(path), path)
+        res = gen._path_intern.get(key)
+        if res is None:
+            res = gen._path_intern[key] = SourcePath.new(self, path)
+        return res
+
+    def _input_path(self, gen: Generator, path) -> BuildPath:
+        """
+        Returns `BuildPath.new(self, path)`, reusing the object created for the same path before
+        """
+
+        # environments can have different build directories, depending on NPBUILD at creation
+        key = (BuildPath, self._build_dir, self.cur_dir, type(path), path)
+        res = gen._path_intern.get(key)
+        if res is None:
+            res = gen._path_intern[key] = BuildPath.new(self, path)
+        return res
+
+    def _obj_path(self, gen: Generator, path, suffix: str) -> BuildPath:
+        """
+        Returns `BuildPath.with_file_ext(self, path, suffix)`, reusing the object created for the
+        same path before
+        """
+
+        key = (BuildPath, self._build_dir, self.cur_dir, type(path), path, suffix)
+        res = gen._path_intern.get(key)
+        if res is None:
+            res = gen._path_intern[key] = BuildPath.with_file_ext(self, path, suffix)
+        return res
+
+    def _compile_flags(self, keys: tuple[str, ...]) -> str:
+        """
+        Returns the joined flags of the given variables followed by the include paths
+        """
+
+        return f"{self._joined(keys)} {self._joined(('CPPPATH',), prefix='-I')}"
 
     def sub_build(self, gen: Generator, dir: str):
         """
@@ -257,22 +470,27 @@ class Env:
         The return value of the build function in the subdirectory
         """
 
-        old_cwd = self.cur_dir
-        self._cwd.path += '/' + dir
+        self._cwd.push(dir)
 
         gen._add_build_file(self.cur_dir + '/build.py')
 
-        # import module
-        mod_path = self.cur_dir[2:].replace('/', '.')
-        spec = importlib.util.spec_from_file_location(mod_path, self.cur_dir + '/build.py')
-        sub = importlib.util.module_from_spec(spec)
-        sys.modules[spec.name] = sub
-        spec.loader.exec_module(sub)
+        # import module, unless we have entered this directory before
+        build = Env._sub_build_cache.get(self.cur_dir)
+        if build is None:
+            import importlib.util  # pylint: disable=C0415
+
+            mod_path = self.cur_dir[2:].replace('/', '.')
+            spec = importlib.util.spec_from_file_location(mod_path, self.cur_dir + '/build.py')
+            sub = importlib.util.module_from_spec(spec)
+            sys.modules[spec.name] = sub
+            spec.loader.exec_module(sub)
+            build = sub.build
+            Env._sub_build_cache[self.cur_dir] = build
 
         # call build function in module
-        res = sub.build(gen, self)
+        res = build(gen, self)
 
-        self._cwd.path = old_cwd
+        self._cwd.pop()
         return res
 
     def glob(self, gen: Generator, pattern: str) -> list[SourcePath]:
@@ -304,8 +522,7 @@ class Env:
 
         pat = SourcePath.new(self, pattern)
         gen._add_glob(pat)
-        files = glob(pat, recursive=True)
-        return [SourcePath(f) for f in files]
+        return [SourcePath(f) for f in iglob(gen._dir_cache, pat)]
 
     def install(self, gen: Generator, outdir: str, input: str) -> str:
         """
@@ -343,11 +560,11 @@ class Env:
         The path of the installed file
         """
 
-        flags = ' '.join(self['INSTFLAGS'])
+        flags = self._joined(('INSTFLAGS',))
         edge = BuildEdge(
             'install',
             outs=[out],
-            ins=[SourcePath.new(self, input)],
+            ins=[self._source_path(gen, input)],
             vars={
                 'instflags': flags
             }
@@ -379,9 +596,9 @@ class Env:
         edge = BuildEdge(
             'strip',
             outs=[bin],
-            ins=[SourcePath.new(self, input)],
+            ins=[self._source_path(gen, input)],
             vars={
-                'strip': self['STRIP']
+                'strip': self._vars['STRIP']
             }
         )
         gen.add_build(edge)
@@ -408,16 +625,15 @@ class Env:
         A `BuildPath` to the output file
         """
 
-        flags = ' '.join(self['CPPFLAGS'])
-        flags += ' ' + ' '.join(['-I' + i for i in self['CPPPATH']])
+        flags = self._compile_flags(('CPPFLAGS',))
 
         bin = BuildPath.new(self, out)
         edge = BuildEdge(
             'cpp',
             outs=[bin],
-            ins=[SourcePath.new(self, input)],
+            ins=[self._source_path(gen, input)],
             vars={
-                'cpp': self['CPP'],
+                'cpp': self._vars['CPP'],
                 'cppflags': flags
             }
         )
@@ -448,9 +664,7 @@ class Env:
         A `BuildPath` to the output file
         """
 
-        flags = ' '.join(self['ASFLAGS'] + self['CPPFLAGS'])
-        flags += ' ' + ' '.join(['-I' + i for i in self['CPPPATH']])
-        return self._cc(gen, out, ins, flags)
+        return self._obj(gen, 'asm', out, ins)
 
     def cc(self, gen: Generator, out: str, ins: list[str]) -> BuildPath:  # pylint: disable=C0103
         """
@@ -474,23 +688,7 @@ class Env:
         A `BuildPath` to the output file
         """
 
-        flags = ' '.join(self['CFLAGS'] + self['CPPFLAGS'])
-        flags += ' ' + ' '.join(['-I' + i for i in self['CPPPATH']])
-        return self._cc(gen, out, ins, flags)
-
-    def _cc(self, gen: Generator, out: str, ins: list[str], flags: str) -> BuildPath:
-        obj = BuildPath.new(self, out)
-        edge = BuildEdge(
-            'cc',
-            outs=[obj],
-            ins=[SourcePath.new(self, i) for i in ins],
-            vars={
-                'cc': self['CC'],
-                'ccflags': flags
-            }
-        )
-        gen.add_build(edge)
-        return obj
+        return self._obj(gen, 'cc', out, ins)
 
     def cxx(self, gen: Generator, out: str, ins: list[str]) -> BuildPath:
         """
@@ -514,21 +712,55 @@ class Env:
         A `BuildPath` to the output file
         """
 
-        flags = ' '.join(self['CXXFLAGS'] + self['CPPFLAGS'])
-        flags += ' ' + ' '.join(['-I' + i for i in self['CPPPATH']])
+        return self._obj(gen, 'cxx', out, ins)
 
+    def _obj(self, gen: Generator, method: str, out: str, ins: list[str]) -> BuildPath:
         obj = BuildPath.new(self, out)
+        make_edge = self._obj_factory(method)
+        gen.add_build(make_edge(obj, [self._source_path(gen, i) for i in ins]))
+        return obj
+
+    def cc_batch(self, gen: Generator, outs: list[str], ins: list[str]) -> list[BuildPath]:
+        """
+        Runs the C compiler on the given input files with a single command
+
+        In contrast to `Env.cc`, this method produces one build edge for all files, which compiles
+        `ins[i]` to `outs[i]` for each i. Thus, Ninja starts one command instead of one per file,
+        but also rebuilds all files whenever one of them changes.
+
+        Parameters
+        ----------
+        :param gen: the generator
+        :param outs: the list of output files
+        :param ins: the list of input files (one per output file)
+
+        Variables
+        ---------
+        :param `CC`: the tool name (e.g., 'gcc')
+        :param `CFLAGS`: the flags (e.g., ['-Wall'])
+        :param `CPPFLAGS`: the preprocessor flags (e.g., ['-DFOO=1'])
+        :param `CPPPATH`: the include paths (e.g., ['include'])
+
+        Returns
+        -------
+        A list of `BuildPath`s to the output files
+        """
+
+        assert len(outs) == len(ins), "The number of output and input files needs to match"
+
+        objs = [BuildPath.new(self, o) for o in outs]
         edge = BuildEdge(
-            'cxx',
-            outs=[obj],
-            ins=[SourcePath.new(self, i) for i in ins],
+            'cc_multi',
+            outs=objs,
+            ins=[self._source_path(gen, i) for i in ins],
             vars={
-                'cxx': self['CXX'],
-                'cxxflags': flags
+                'cc': self._vars['CC'],
+                'ccflags': self._compile_flags(('CFLAGS', 'CPPFLAGS')),
+                'ccdeps': objs[0] + '.batch.d'
             }
         )
         gen.add_build(edge)
-        return obj
+        return objs
 
     def objs(self, gen: Generator, ins: list[str]) -> list[BuildPath]:
         """
@@ -548,21 +780,95 @@ class Env:
         A list of `BuildPath`s to the object files
         """
 
+        # build larger numbers of files in bulk, unless a subclass customizes the per-file methods
+        if len(ins) > 8 and all(getattr(type(self), m) is getattr(Env, m) for m in _OBJ_METHODS):
+            return self.objs_batch(gen, ins)
+
         # add a per-environment suffix to allow users to build the same files in different
         # environments without interference
         suffix = str(self._id) + '.o'
         objs = []
         for i in ins:
-            if i.endswith('.S') or i.endswith('.s'):
-                objs.append(self.asm(gen, BuildPath.with_file_ext(self, i, suffix), [i]))
-            elif i.endswith('.c'):
-                objs.append(self.cc(gen, BuildPath.with_file_ext(self, i, suffix), [i]))
-            elif i.endswith('.cc') or i.endswith('.cpp'):
-                objs.append(self.cxx(gen, BuildPath.with_file_ext(self, i, suffix), [i]))
-            elif i.endswith('.o') or i.endswith('.a') or i.endswith('.so'):
-                objs.append(BuildPath.new(self, i))
+            method = _EXT_DISPATCH.get(i[i.rfind('.'):])
+            if method:
+                objs.append(getattr(self, method)(gen, self._obj_path(gen, i, suffix), [i]))
+            elif method is not None:
+                objs.append(self._input_path(gen, i))
+        return objs
+
+    def objs_batch(self, gen: Generator, ins: list[str]) -> list[BuildPath]:
+        """
+        Produces object files for the given input files in bulk
+
+        This method produces the same build edges as `Env.objs`, but determines the rule and
+        variables only once per file type instead of calling `Env.asm`, `Env.cc`, or `Env.cxx` for
+        each file. Afterwards, all build edges are added to the generator at once via
+        `Generator.add_builds`. `Env.objs` uses this method automatically for more than a few input
+        files.
+
+        Parameters
+        ----------
+        :param gen: the generator
+        :param ins: the list of input files
+
+        Returns
+        -------
+        A list of `BuildPath`s to the object files
+        """
+
+        suffix = str(self._id) + '.o'
+        factories = {}
+        edges = []
+        objs = []
+        for i in ins:
+            method = _EXT_DISPATCH.get(i[i.rfind('.'):])
+            if method:
+                make_edge = factories.get(method)
+                if make_edge is None:
+                    make_edge = factories[method] = self._obj_factory(method)
+                obj = self._obj_path(gen, i, suffix)
+                edges.append(make_edge(obj, [self._source_path(gen, i)]))
+                objs.append(obj)
+            elif method is not None:
+                objs.append(self._input_path(gen, i))
+        gen.add_builds(edges)
         return objs
 
+    def _obj_factory(self, method: str):
+        """
+        Returns a function that creates the build edge of the given method of `Env` for an object
+        file and its inputs
+
+        The rule and variables are determined once and shared between all build edges produced by
+        the function. The function is cached until any variable is changed.
+        """
+
+        key = ('factory', method)
+        cached = self._cached(key)
+        if cached is not _UNCACHED:
+            return cached
+
+        flags = _OBJ_FLAGS[method]
+        if method == 'cxx':
+            rule = 'cxx'
+            vars = {
+                'cxx': self._vars['CXX'],
+                'cxxflags': self._compile_flags(('CXXFLAGS', 'CPPFLAGS'))
+            }
+        else:
+            rule = 'cc'
+            vars = {
+                'cc': self._vars['CC'],
+                'ccflags': self._compile_flags((flags, 'CPPFLAGS'))
+            }
+
+        # the function must not refer to the environment, because clones share the cache. all edges
+        # share the variables, which is fine as `BuildEdge.vars` are not changed after creation.
+        def make_edge(obj: BuildPath, ins: list[SourcePath]) -> BuildEdge:
+            return BuildEdge(rule, outs=[obj], ins=ins, vars=vars)
+
+        return self._store(key, (flags, 'CPPFLAGS', 'CPPPATH'), make_edge)
+
     def static_lib(self, gen: Generator, out: str, ins: list[str]) -> BuildPath:
         """
         Produces the static library `"lib" + out + ".a"` from given input files
@@ -586,15 +892,15 @@ class Env:
         The `BuildPath` to the produced static library
         """
 
-        flags = ' '.join(self['ARFLAGS'])
+        flags = self._joined(('ARFLAGS',))
         lib = BuildPath.new(self, 'lib' + out + '.a')
         edge = BuildEdge(
             'ar',
             outs=[lib],
             ins=self.objs(gen, ins),
             vars={
-                'ar': self['AR'],
-                'ranlib': self['RANLIB'],
+                'ar': self._vars['AR'],
+                'ranlib': self._vars['RANLIB'],
                 'arflags': flags
             }
         )
@@ -623,14 +929,14 @@ class Env:
         The `BuildPath` to the produced shared library
         """
 
-        flags = ' '.join(self['SHLINKFLAGS'])
+        flags = self._joined(('SHLINKFLAGS',))
         lib = BuildPath.new(self, 'lib' + out + '.so')
         edge = BuildEdge(
             'shlink',
             outs=[lib],
             ins=self.objs(gen, ins),
             vars={
-                'shlink': self['SHLINK'],
+                'shlink': self._vars['SHLINK'],
                 'shlinkflags': flags
             }
         )
@@ -666,7 +972,7 @@ class Env:
 
         libs = [] if libs is None else libs
         deps = [] if deps is None else deps
-        return self._c_cxx_exe(gen, out, ins, libs, deps, self['CC'])
+        return self._c_cxx_exe(gen, out, ins, libs, deps, self._vars['CC'])
 
     # pylint: disable=R0917
     def cxx_exe(self, gen: Generator, out: str, ins: list[str],
@@ -697,17 +1003,20 @@ class Env:
 
         libs = [] if libs is None else libs
         deps = [] if deps is None else deps
-        return self._c_cxx_exe(gen, out, ins, libs, deps, self['CXX'])
+        return self._c_cxx_exe(gen, out, ins, libs, deps, self._vars['CXX'])
 
     # pylint: disable=R0917
     def _c_cxx_exe(self, gen: Generator, out: str, ins: list[str],
                    libs: list[str], deps: list[str], linker: str) -> BuildPath:
-        flags = ' '.join(self['LINKFLAGS'])
+        flags = self._joined(('LINKFLAGS',))
         if len(libs) > 0:
-            flags += ' ' + ' '.join(['-L' + dir for dir in self['LIBPATH']])
-            flags += ' -Wl,--start-group'
-            flags += ' ' + ' '.join(['-l' + lib for lib in libs])
-            flags += ' -Wl,--end-group'
+            flags = ' '.join([
+                flags,
+                self._joined(('LIBPATH',), prefix='-L'),
+                '-Wl,--start-group',
+                ' '.join('-l' + lib for lib in libs),
+                '-Wl,--end-group',
+            ])
 
         bin = BuildPath.new(self, out)
         edge = BuildEdge(
@@ -716,7 +1025,7 @@ class Env:
             ins=self.objs(gen, ins),
             deps=deps,
             libs=libs,
-            lib_path=self['LIBPATH'],
+            lib_path=self._vars['LIBPATH'],
             vars={
                 'link': linker,
                 'linkflags': flags
@@ -821,33 +1130,16 @@ class Env:
         A list of `BuildPath`s to the produced files
         """
 
-        # determine whether cargo puts the output in a target-specific directory
-        target_dir = ''
-        try:
-            idx = self['CRGFLAGS'].index('--target')
-            # if it's a path to the spec, the triple is the filename without extension
-            if self['CRGFLAGS'][idx + 1].endswith('.json'):
-                target_dir = Path(self['CRGFLAGS'][idx + 1]).stem
-            # otherwise it's already the triple we need
-            else:
-                target_dir = self['CRGFLAGS'][idx + 1]
-            target_dir += '/'
-        except ValueError:
-            pass
-
         # determine destination directory
-        btype = 'release' if '--release' in self['CRGFLAGS'] else 'debug'
-        dest_dir = BuildPath(self.build_dir + '/' + self['RUSTOUT'] + '/' + target_dir + btype)
+        target_dir, btype = self._cargo_profile()
+        dest_dir = BuildPath(f"{self.build_dir}/{self._vars['RUSTOUT']}/{target_dir}{btype}")
         out_paths = [BuildPath(dest_dir + '/' + o) for o in outs]
 
-        flags = ' '.join(self['CRGFLAGS'])
         # make sure that cargo puts it there
-        flags += ' --target-dir "' + os.path.abspath(self.build_dir + '/' + self['RUSTOUT']) + '"'
+        flags = f'{self._joined(("CRGFLAGS",))} --target-dir "{self._rust_target_path()}"'
 
         # build environment variables
-        vars_str = ''
-        for key, value in self['CRGENV'].items():
-            vars_str += ' ' + key + '="' + value + '"'
+        vars_str = ''.join([f' {key}="{value}"' for key, value in self._vars['CRGENV'].items()])
 
         edge = BuildEdge(
             'cargo',
@@ -855,7 +1147,7 @@ class Env:
             ins=[],
             deps=deps,
             vars={
-                'cargo': self['CARGO'],
+                'cargo': self._vars['CARGO'],
                 'dir': self.cur_dir,
                 'cargoflags': 'build ' + flags,
                 'env': vars_str
@@ -863,3 +1155,43 @@ class Env:
         )
         gen.add_build(edge)
         return out_paths
+
+    def _cargo_profile(self) -> tuple[str, str]:
+        """
+        Returns the target directory (empty or with trailing slash) and the build type for the
+        current `CRGFLAGS`
+
+        The result is cached until any variable is changed.
+        """
+
+        key = ('cargo',)
+        res = self._cached(key)
+        if res is not _UNCACHED:
+            return res
+
+        target_dir = ''
+        release = False
+        # determine whether cargo puts the output in a target-specific directory
+        prev = None
+        for flag in self._vars['CRGFLAGS']:
+            # only the first `--target` determines the directory
+            if prev == '--target' and not target_dir:
+                # if it's a path to the spec, the triple is the filename without extension
+                if flag.endswith('.json'):
+                    target_dir = os.path.splitext(os.path.basename(flag))[0] + '/'
+                # otherwise it's already the triple we need
+                else:
+                    target_dir = flag + '/'
+            elif flag == '--release':
+                release = True
+            prev = flag
+
+        return self._store(key, ('CRGFLAGS',), (target_dir, 'release' if release else 'debug'))
+
+    def _rust_target_path(self) -> str:
+        key = (self.build_dir, self._vars['RUSTOUT'])
+        path = Env._abspath_cache.get(key)
+        if path is None:
+            path = os.path.abspath(key[0] + '/' + key[1])
+            Env._abspath_cache[key] = path
+        return path
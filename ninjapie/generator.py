@@ -1,11 +1,79 @@
+from collections import Counter, defaultdict
 import os
 import re
-import traceback
-from glob import glob
+import sys
+
+from ninjapie.dirs import listdir
+
+
+# marks variables without default value
+_NO_DEFAULT = object()
+# machine-specific flags, which are not passed to clang
+_MACHINE_FLAG_RE = re.compile(r'\s+-m\S+')
+# the variable holding the flags for each rule in compile_commands.json
+_FLAGS_KEY = {'cc': 'ccflags', 'cc_multi': 'ccflags', 'cxx': 'cxxflags'}
+
+
+def _has_content(path: str, data: bytes) -> bool:
+    try:
+        if os.path.getsize(path) != len(data):
+            return False
+        with open(path, 'rb') as file:
+            return file.read() == data
+    except OSError:
+        return False
+
+
+def write_file(path: str, data: bytes):
+    # if nothing changed, only update the modification time. ninja still needs that to consider the
+    # file up to date, but tools watching the file are not disturbed by a rewrite.
+    if _has_content(path, data):
+        os.utime(path)
+        return
+
+    # write to a temporary file first and rename it afterwards, so that readers never see a
+    # partially written file. the data is written directly to the file descriptor to bypass the
+    # buffering of file objects.
+    tmp_path = path + '.tmp'
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
+    os.replace(tmp_path, path)
+
+
+def calltrace() -> list[tuple]:
+    """
+    Returns the current call stack (without this function), outermost call first
+
+    In contrast to `traceback.extract_stack`, only the code locations are recorded; the source lines
+    are looked up by `format_calltrace` when the stack is printed.
+    """
+
+    trace = []
+    frame = sys._getframe(1)
+    while frame is not None:
+        trace.append((frame.f_code.co_filename, frame.f_lineno, frame.f_code.co_name, None))
+        frame = frame.f_back
+    trace.reverse()
+    return trace
+
+
+def format_calltrace(trace: list[tuple]) -> str:
+    # only needed for error messages, so don't import it for every build
+    import traceback  # pylint: disable=C0415
+    return ''.join(traceback.format_list(trace))
 
 
 def path_list(paths: list[str]) -> str:
-    return ' '.join(p.replace(' ', '$ ') for p in paths)
+    res = ' '.join(paths)
+    # only escape the paths individually if any of them contains a space
+    if res.count(' ') >= len(paths):
+        res = ' '.join([p.replace(' ', '$ ') for p in paths])
+    return res
 
 
 class Rule:
@@ -18,6 +86,8 @@ class Rule:
     purposes.
     """
 
+    __slots__ = ('cmd', 'desc', 'deps', 'depfile', 'generator', 'pool', 'restat')
+
     # pylint: disable=R0917
     def __init__(self, cmd: str, desc: str, deps: str = '', depfile: str = '',
                  generator: str = '', pool: str = '', restat: bool = False):
@@ -51,31 +121,36 @@ class Rule:
         self.generator = generator
         self.pool = pool
         self.restat = restat
-        self.refs = 0
 
-    def _write_to_file(self, name: str, file):
+    def _key(self) -> tuple:
+        """
+        Returns the properties that determine the behavior of this rule
         """
-        Writes this rule to the given file object
+
+        return (self.cmd, self.desc, self.deps, self.depfile, self.generator, self.pool,
+                self.restat)
+
+    def _emit(self, name: str, out: list[str]):
+        """
+        Appends the text of this rule to the given list
 
         Parameters
         ----------
         :param name: the name of the rule
-        :param file: the file object
+        :param out: the list of strings that make up the build file
         """
 
-        file.write('rule %s\n' % name)
-        file.write('  command = %s\n' % self.cmd)
-        file.write('  description = %s\n' % self.desc)
+        out.append(f'rule {name}\n  command = {self.cmd}\n  description = {self.desc}\n')
         if self.deps != '':
-            file.write('  deps = %s\n' % self.deps)
+            out.append(f'  deps = {self.deps}\n')
         if self.depfile != '':
-            file.write('  depfile = %s\n' % self.depfile)
+            out.append(f'  depfile = {self.depfile}\n')
         if self.generator != '':
-            file.write('  generator = %s\n' % self.generator)
+            out.append(f'  generator = {self.generator}\n')
         if self.pool != '':
-            file.write('  pool = %s\n' % self.pool)
+            out.append(f'  pool = {self.pool}\n')
         if self.restat:
-            file.write('  restat = 1\n')
+            out.append('  restat = 1\n')
 
 
 class BuildEdge:
@@ -89,6 +164,8 @@ class BuildEdge:
     the output files. Additional dependencies can be specified to also trigger a rebuild.
     """
 
+    __slots__ = ('calltrace', 'rule', 'outs', 'ins', 'deps', 'libs', 'lib_path', 'vars')
+
     # pylint: disable=R0917
     def __init__(self, rule: str, outs: list[str], ins: list[str], deps: list[str] = None,
                  vars: dict[str, str] = None, libs: list[str] = None, lib_path: list[str] = None):
@@ -101,7 +178,9 @@ class BuildEdge:
         :param outs: a list of paths that are produced as outputs when executing the command
         :param ins: a list of paths that are taken as inputs by the command
         :param deps: an optional list of paths with additional dependencies
-        :param vars: an optional list with values for additional variables used in the rule
+        :param vars: an optional list with values for additional variables used in the rule. The
+            dictionary may be shared with other build edges and must therefore not be changed
+            afterwards.
         :param libs: when producing executables, a list of library names that is linked against
         :param lib_path: when producing executables, a list of paths to search the libraries in
         """
@@ -126,25 +205,18 @@ class BuildEdge:
         self.lib_path = lib_path
         self.vars = vars
 
-    def _write_to_file(self, defaults: dict[str, str], file):
+    def _vars_text(self, defaults: dict[str, str]) -> str:
         """
-        Writes this build edge to the given file object
+        Returns the variable assignments of this build edge that differ from the given defaults
 
         Parameters
         ----------
         :param defaults: a dictionary with default values. Only if a variable has not the default
             value, it will be specified for the build edge.
-        :param file: the file object
         """
 
-        file.write('build %s: %s %s' %
-                   (path_list(self.outs), self.rule, path_list(self.ins)))
-        if len(self.deps) > 0:
-            file.write(' | %s' % path_list(self.deps))
-        file.write('\n')
-        for key, val in self.vars.items():
-            if key not in defaults or defaults[key] != val:
-                file.write('  %s = %s\n' % (key, val))
+        return ''.join([f'  {key} = {val}\n' for key, val in self.vars.items()
+                        if defaults.get(key, _NO_DEFAULT) != val])
 
 
 class Generator:
@@ -163,6 +235,10 @@ class Generator:
     this information and add them to the `Generator`.
     """
 
+    __slots__ = ('_build_dir', '_debug', '_rules', '_rule_names', '_rule_alias', '_used_rules',
+                 '_build_edges', '_output_owner', '_globs', '_dir_cache', '_path_intern',
+                 '_build_files')
+
     def __init__(self):
         """
         Creates a new `Generator` with the default rules.
@@ -171,8 +247,19 @@ class Generator:
         self._build_dir = os.environ.get('NPBUILD')
         self._debug = os.environ.get('NPDEBUG', '0') == '1'
         self._rules = {}
+        # the first name of each distinct rule and the names of rules identical to an earlier one
+        self._rule_names = {}
+        self._rule_alias = {}
+        # the names of the rules referenced by any build edge (only these are written)
+        self._used_rules = set()
         self._build_edges = []
+        # the build edge producing each output (only maintained in debug mode)
+        self._output_owner = {}
         self._globs = []
+        # the entries of the directories read by `Env.glob` and `Generator.write_to_file`
+        self._dir_cache = {}
+        # the `SourcePath` and `BuildPath` objects created by `Env` for input and object files
+        self._path_intern = {}
         self._build_files = []
 
         # default rules
@@ -198,6 +285,16 @@ class Generator:
             depfile='$out.d',
             desc='CXX $out'
         ))
+        # compiles multiple C files with one command; $in and $out are processed pairwise and the
+        # dependency files are combined into $ccdeps
+        self.add_rule('cc_multi', Rule(
+            cmd='set -- $in; rm -f $ccdeps; for o in $out; do '
+                '$cc -MD -MF $$o.d $ccflags -c $$1 -o $$o && cat $$o.d >> $ccdeps && rm -f $$o.d '
+                '|| exit 1; shift; done',
+            deps='gcc',
+            depfile='$ccdeps',
+            desc='CC $out'
+        ))
         self.add_rule('ar', Rule(
             cmd='$ar rc $arflags $out $in && $ranlib $out',
             desc='AR $out'
@@ -235,16 +332,26 @@ class Generator:
         Adds a new rule to this generator.
 
         These rules can later be referenced when adding build edges via `Generator.add_build`. Note
-        that Rule names are unique and cannot be added twice.
+        that Rule names are unique and cannot be added twice. If the rule is identical to a
+        previously added rule, build edges referring to `name` will use the previous rule instead,
+        so that it is written only once.
 
         Parameters
         ----------
         :param name: The name of the rule
         :param rule: The `Rule` object to add
+
+        Returns
+        -------
+        The name of the rule that will be written to the Ninja build file
         """
 
         assert name not in self._rules
         self._rules[name] = rule
+        canonical = self._rule_names.setdefault(rule._key(), name)
+        if canonical != name:
+            self._rule_alias[name] = canonical
+        return canonical
 
     def add_build(self, edge: BuildEdge):
         """
@@ -261,22 +368,45 @@ class Generator:
         :param rule: The `Rule` object to add
         """
 
+        self._register_build(edge)
+        self._build_edges.append(edge)
+
+    def add_builds(self, edges: list[BuildEdge]):
+        """
+        Adds multiple build edges to this generator.
+
+        This is equivalent to calling `Generator.add_build` for each build edge, but appends all
+        build edges at once.
+
+        Parameters
+        ----------
+        :param edges: The `BuildEdge` objects to add
+        """
+
+        for edge in edges:
+            self._register_build(edge)
+        self._build_edges.extend(edges)
+
+    def _register_build(self, edge: BuildEdge):
+        """
+        Checks the given build edge and accounts it for its rule before it is added
+        """
+
         assert edge.rule in self._rules
+        if self._rule_alias:
+            edge.rule = self._rule_alias.get(edge.rule, edge.rule)
 
         if self._debug:
-            for ex_edge in self._build_edges:
-                # skip edges that don't have a calltrace (e.g., the always-rebuild rule)
-                if ex_edge.calltrace is None:
-                    continue
-
-                for out in ex_edge.outs:
-                    assert out not in edge.outs, \
-                        "Output '{}' is already produced by the build edge added here:\n{}".format(
-                            out, ''.join(traceback.format_list(ex_edge.calltrace)))
-            edge.calltrace = traceback.extract_stack()
-
-        self._rules[edge.rule].refs += 1
-        self._build_edges.append(edge)
+            for out in edge.outs:
+                ex_edge = self._output_owner.get(out)
+                assert ex_edge is None, \
+                    "Output '{}' is already produced by the build edge added here:\n{}".format(
+                        out, format_calltrace(ex_edge.calltrace))
+            for out in edge.outs:
+                self._output_owner[out] = edge
+            edge.calltrace = calltrace()
+
+        self._used_rules.add(edge.rule)
 
     def _add_glob(self, pattern):
         """
@@ -332,12 +462,14 @@ class Generator:
             generator='1',
             desc='Regenerating build.ninja',
         ))
+        # the generator also depends on the ninjapie implementation (the *.py files next to us)
         this_dir = os.path.dirname(os.path.abspath(__file__))
         self.add_build(BuildEdge(
             'generator',
             outs=[build_file],
             ins=[],
-            deps=glob(this_dir + "/*.py"),
+            deps=[this_dir + '/' + name for name in listdir(self._dir_cache, this_dir, False)
+                  if name.endswith('.py') and not name.startswith('.')],
         ))
 
         self._finalize_deps()
@@ -345,26 +477,7 @@ class Generator:
             defaults = self._determine_defaults()
 
         # generate build.ninja
-        with open(build_file, 'w', encoding='utf-8') as file:
-            file.write('# This file has been generated by the ninjapie build system.\n')
-            file.write('\n')
-
-            for key, val in defaults.items():
-                file.write('%s = %s\n' % (key, val))
-            file.write('\n')
-
-            for name, rule in self._rules.items():
-                if rule.refs > 0:
-                    rule._write_to_file(name, file)
-            file.write('\n')
-
-            # separate pool for the build.ninja regeneration to run that alone
-            file.write('pool build_pool\n')
-            file.write('  depth = 1\n')
-            file.write('\n')
-
-            for edge in self._build_edges:
-                edge._write_to_file(defaults, file)
+        write_file(build_file, ''.join(self._emit(defaults)).encode('utf-8'))
 
         # generate deps of build.ninja
         build_files = ['build.py'] + self._build_files
@@ -376,35 +489,80 @@ class Generator:
             for glb in self._globs:
                 file.write(glb + '\n')
 
+    def _emit(self, defaults: dict[str, str]) -> list[str]:
+        """
+        Collects the text of the Ninja build file to write it at once
+
+        Parameters
+        ----------
+        :param defaults: the default variables
+
+        Returns
+        -------
+        A list of strings that make up the build file
+        """
+
+        parts = ['# This file has been generated by the ninjapie build system.\n\n']
+
+        for key, val in defaults.items():
+            parts.append(f'{key} = {val}\n')
+        parts.append('\n')
+
+        # write the rules in the order they have been added
+        for name, rule in self._rules.items():
+            if name in self._used_rules:
+                rule._emit(name, parts)
+        parts.append('\n')
+
+        # separate pool for the build.ninja regeneration to run that alone
+        parts.append('pool build_pool\n  depth = 1\n\n')
+
+        # edges created from the same template share their variables, so render them only once.
+        # the dictionaries are kept alive by the edges, so that their ids are unique here.
+        vars_texts = {}
+        for edge in self._build_edges:
+            vars_text = vars_texts.get(id(edge.vars))
+            if vars_text is None:
+                vars_text = edge._vars_text(defaults) if edge.vars else ''
+                vars_texts[id(edge.vars)] = vars_text
+            outs = path_list(edge.outs)
+            ins = path_list(edge.ins)
+            deps = f' | {path_list(edge.deps)}' if edge.deps else ''
+            parts.append(f'build {outs}: {edge.rule} {ins}{deps}\n{vars_text}')
+        return parts
+
     def write_compile_cmds(self, outdir: str = None):
         """
         Writes a `compiler_commands.json` file for `clangd`.
 
         This file is leveraged by the language server `clangd` to know how your source files are
         build. The file is written to `$NPBUILD/compile_commands.json` and will be overwritten, if
-        existing. Note that only the rules `cxx` and `cc` are considered.
+        existing. Note that only the rules `cxx`, `cc`, and `cc_multi` are considered.
         """
 
         if outdir is None:
             outdir = self._build_dir
 
-        # generate compile_commands.json for clangd
+        base_dir = os.getcwd()
+        entries = []
+        for edge in self._build_edges:
+            if edge.rule in ('cxx', 'cc'):
+                assert len(edge.ins) == 1
+                entries.append({
+                    'directory': base_dir,
+                    'file': edge.ins[0],
+                    'command': self._get_clang_flags(edge),
+                })
+            elif edge.rule == 'cc_multi':
+                command = self._get_clang_flags(edge)
+                entries.extend({'directory': base_dir, 'file': i, 'command': command}
+                               for i in edge.ins)
+
+        # generate compile_commands.json for clangd; json is only needed here, so import it lazily
+        import json  # pylint: disable=C0415
         with open(outdir + '/compile_commands.json', 'w', encoding='utf-8') as cmds:
-            cmds.write('[\n')
-            base_dir = os.getcwd()
-            count = 0
-            for edge in self._build_edges:
-                if edge.rule in ('cxx', 'cc'):
-                    assert len(edge.ins) == 1
-                    if count > 0:
-                        cmds.write(',\n')
-                    cmds.write('  {\n')
-                    cmds.write('    "directory": "{}",\n'.format(base_dir))
-                    cmds.write('    "file": "{}",\n'.format(edge.ins[0]))
-                    cmds.write('    "command": "{}"\n'.format(self._get_clang_flags(edge)))
-                    cmds.write('  }')
-                    count += 1
-            cmds.write('\n]\n')
+            json.dump(entries, cmds, indent=2, ensure_ascii=False)
+            cmds.write('\n')
 
     def _get_clang_flags(self, bedge: BuildEdge) -> str:
         """
@@ -419,11 +577,10 @@ class Generator:
         A string with the flags
         """
 
-        flags = 'ccflags' if bedge.rule == 'cc' else 'cxxflags'
-        flag_str = 'clang' if bedge.rule == 'cc' else 'clang++'
-        flag_str += ' ' + bedge.vars[flags].replace('"', '\\"')
+        compiler = 'clang++' if bedge.rule == 'cxx' else 'clang'
+        flag_str = compiler + ' ' + bedge.vars[_FLAGS_KEY[bedge.rule]]
         # remove all machine specific flags, because clang does not support all ISAs, etc.
-        return re.sub(r'\s+-m\S+', '', flag_str)
+        return _MACHINE_FLAG_RE.sub('', flag_str)
 
     def _determine_defaults(self) -> dict[str, str]:
         """
@@ -440,28 +597,13 @@ class Generator:
         """
 
         # first count the number of times for each value and each variable
-        vars = {}
+        vars = defaultdict(Counter)
         for edge in self._build_edges:
             for key, val in edge.vars.items():
-                if key not in vars:
-                    vars[key] = {}
-                if val in vars[key]:
-                    vars[key][val] += 1
-                else:
-                    vars[key][val] = 1
-
-        # now use the most-used value for each variable as the default
-        defaults = {}
-        for name, vals in vars.items():
-            max_count = 0
-            max_key = None
-            for key, count in vals.items():
-                if count > max_count:
-                    max_key = key
-                    max_count = count
-            if max_key is not None:
-                defaults[name] = max_key
-        return defaults
+                vars[key][val] += 1
+
+        # now use the most-used value for each variable as the default (the first one on ties)
+        return {name: vals.most_common(1)[0][0] for name, vals in vars.items()}
 
     def _finalize_deps(self):
         """
@@ -475,30 +617,29 @@ class Generator:
         """
 
         libs = self._collect_libs()
+        # most executables link against the same libraries, so build their file names only once
+        names = {}
         for edge in self._build_edges:
             for lib in edge.libs:
-                stname = 'lib' + lib + '.a'
-                shname = 'lib' + lib + '.so'
+                lib_names = names.get(lib)
+                if lib_names is None:
+                    lib_names = names[lib] = (f'lib{lib}.so', f'lib{lib}.a')
+                shname, stname = lib_names
                 for path in edge.lib_path:
-                    if path in libs:
-                        if shname in libs[path]:
-                            edge.deps.append(libs[path][shname])
-                            break
-                        if stname in libs[path]:
-                            edge.deps.append(libs[path][stname])
-                            break
+                    # prefer the shared library, like the linker
+                    out = libs.get((path, shname)) or libs.get((path, stname))
+                    if out is not None:
+                        edge.deps.append(out)
+                        break
 
-    def _collect_libs(self) -> dict[str, dict[str, str]]:
+    def _collect_libs(self) -> dict[tuple[str, str], str]:
         """
-        Collects the libraries that we build ourself.
+        Collects the libraries that we build ourself, indexed by their directory and file name.
         """
 
         libs = {}
         for edge in self._build_edges:
             for out in edge.outs:
                 if out.endswith('.a') or out.endswith('.so'):
-                    dir = os.path.dirname(out)
-                    if dir not in libs:
-                        libs[dir] = {}
-                    libs[dir][os.path.basename(out)] = out
+                    libs[os.path.split(out)] = out
         return libs
@@ -8,29 +8,21 @@ class SourcePath(str):
     This class is used to refer to source files. These are specified relative to the current
     directory in the given environment (`Env.cur_dir`).
 
-    `SourcePath` implements `__str__` and `__repr__` and can thus be used as a string (the contained
-    path).
+    `SourcePath` is a string (the contained path) and can thus be used as such. `SourcePath(path)`
+    simply uses the given path.
     """
 
-    def __init__(self, path: str):
-        """
-        Creates a new `SourcePath` that simply uses the given path
-
-        Parameters
-        ----------
-        :param path: the path
-        """
-
-        self._path = path
+    # the path is the string itself, so don't give each object a dictionary as well
+    __slots__ = ()
 
     @staticmethod
     def new(env, path):
         """
         Creates a new `SourcePath` from given path object
 
-        The path object can be a `SourcePath`, `BuildPath` or `str`. The former two just create a
-        `SourcePath` with the path within the existing object, whereas `str` is interpreted relative
-        to `Env.cur_dir`.
+        The path object can be a `SourcePath`, `BuildPath` or `str`. A `SourcePath` is returned as
+        is, a `BuildPath` produces a `SourcePath` with the same path, whereas `str` is interpreted
+        relative to `Env.cur_dir`.
 
         Parameters
         ----------
@@ -43,16 +35,10 @@ class SourcePath(str):
         """
 
         if isinstance(path, SourcePath):
-            return SourcePath(path._path)
+            return path
         if isinstance(path, BuildPath):
-            return SourcePath(path._path)
-        return SourcePath(env.cur_dir + '/' + path)
-
-    def __str__(self) -> str:
-        return self._path
-
-    def __repr__(self) -> str:
-        return repr(self._path)
+            return SourcePath(path)
+        return SourcePath(f'{env.cur_dir}/{path}')
 
 
 class BuildPath(str):
@@ -63,28 +49,20 @@ class BuildPath(str):
     directory and the build directory in the given environment (`Env.cur_dir`). So, basically build
     files are put into `"$NPBUILD/" + Env.cur_dir`.
 
-    `BuildPath` implements `__str__` and `__repr__` and can thus be used as a string (the contained
-    path).
+    `BuildPath` is a string (the contained path) and can thus be used as such. `BuildPath(path)`
+    simply uses the given path.
     """
 
-    def __init__(self, path: str):
-        """
-        Creates a new `BuildPath` that simply uses the given path
-
-        Parameters
-        ----------
-        :param path: the path
-        """
-
-        self._path = path
+    # the path is the string itself, so don't give each object a dictionary as well
+    __slots__ = ()
 
     @staticmethod
     def new(env, path):
         """
         Creates a new `BuildPath` from given path object
 
-        The path object can be a `SourcePath`, `BuildPath` or `str`. If it's build path, it simply
-        creates a copy. If it's a source path, it produces a `BuildPath` consisting of
+        The path object can be a `SourcePath`, `BuildPath` or `str`. If it's build path, it is
+        returned as is. If it's a source path, it produces a `BuildPath` consisting of
         `Env.build_dir` and the path. If it's a string, it produces a `BuildPath` consisting of
         `Env.build_dir`, `Env.cur_dir` and the string.
 
@@ -99,10 +77,10 @@ class BuildPath(str):
         """
 
         if isinstance(path, BuildPath):
-            return BuildPath(path._path)
+            return path
         if isinstance(path, SourcePath):
-            return BuildPath(env.build_dir + '/' + path._path)
-        return BuildPath(env.build_dir + '/' + env.cur_dir + '/' + path)
+            return BuildPath(f'{env.build_dir}/{path}')
+        return BuildPath(f'{env.build_dir}/{env.cur_dir}/{path}')
 
     @staticmethod
     def with_file_ext(env, path, ext: str):
@@ -125,13 +103,7 @@ class BuildPath(str):
 
         (root, _cur_ext) = os.path.splitext(path)
         if isinstance(path, BuildPath):
-            return BuildPath(root + '.' + ext)
+            return BuildPath(f'{root}.{ext}')
         if isinstance(path, SourcePath):
-            return BuildPath.new(env, SourcePath(root + '.' + ext))
-        return BuildPath.new(env, root + '.' + ext)
-
-    def __str__(self) -> str:
-        return self._path
-
-    def __repr__(self) -> str:
-        return repr(self._path)
+            return BuildPath(f'{env.build_dir}/{root}.{ext}')
+        return BuildPath(f'{env.build_dir}/{env.cur_dir}/{root}.{ext}')
@@ -0,0 +1,5 @@
+#include "foo.h"
+
+int bar(void) {
+    return 2;
+}
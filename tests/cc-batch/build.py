@@ -0,0 +1,11 @@
+from ninjapie import Generator, Env
+
+gen = Generator()
+env = Env()
+
+env['CFLAGS'] += ['-Wall', '-Wextra']
+objs = env.cc_batch(gen, outs=['foo.o', 'bar.o'], ins=['foo.c', 'bar.c'])
+env.c_exe(gen, out='hello', ins=objs + ['hello.c'])
+
+gen.write_to_file()
+gen.write_compile_cmds()
@@ -0,0 +1,6 @@
+#!/bin/bash
+source "../helper.sh"
+check_build && check_no_work && check_run "./build/hello" || exit 1
+# the combined dependency file of the batch needs to contain the header
+touch foo.h
+check_rebuild "set -- foo\.c bar\.c" && check_no_work
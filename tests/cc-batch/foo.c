@@ -0,0 +1,5 @@
+#include "foo.h"
+
+int foo(void) {
+    return 1;
+}
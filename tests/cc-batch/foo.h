@@ -0,0 +1,2 @@
+int foo(void);
+int bar(void);
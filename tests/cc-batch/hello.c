@@ -0,0 +1,8 @@
+#include <stdio.h>
+
+#include "foo.h"
+
+int main() {
+    printf("Hello World %d!\n", foo() + bar());
+    return 0;
+}
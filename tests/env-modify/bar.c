@@ -0,0 +1,7 @@
+#ifndef BAR
+#    error "BAR needs to be defined for bar.c"
+#endif
+
+int bar(void) {
+    return BAR;
+}
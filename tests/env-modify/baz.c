@@ -0,0 +1,7 @@
+#ifdef QUX
+#    error "QUX must not be defined for baz.c"
+#endif
+
+int baz(void) {
+    return 3;
+}
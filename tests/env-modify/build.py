@@ -0,0 +1,29 @@
+from ninjapie import Generator, Env
+
+gen = Generator()
+env = Env()
+
+# change the flags via a reference after the first build edge has been created
+cflags = env['CFLAGS']
+foo = env.cc(gen, out='foo.o', ins=['foo.c'])
+cflags.append('-DBAR=1')
+bar = env.cc(gen, out='bar.o', ins=['bar.c'])
+
+# changes via a reference must not affect clones that have been created before
+cppflags = env['CPPFLAGS']
+baz_env = env.clone()
+cppflags.append('-DQUX=1')
+baz = baz_env.cc(gen, out='baz.o', ins=['baz.c'])
+
+# assigned lists stay shared with the caller and all environments they have been assigned to
+qux_flags = env['CFLAGS'][:]
+qux_env = env.clone()
+qux_env['CFLAGS'] = qux_flags
+quux_env = env.clone()
+quux_env['CFLAGS'] = qux_flags
+qux_env.add_flag('CFLAGS', '-DQUUX=1')
+qux = quux_env.cc(gen, out='qux.o', ins=['qux.c'])
+
+env.c_exe(gen, out='hello', ins=[foo, bar, baz, qux, 'hello.c'])
+
+gen.write_to_file()
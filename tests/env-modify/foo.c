@@ -0,0 +1,7 @@
+#ifdef BAR
+#    error "BAR must not be defined for foo.c"
+#endif
+
+int foo(void) {
+    return 1;
+}
@@ -0,0 +1,11 @@
+#include <stdio.h>
+
+int foo(void);
+int bar(void);
+int baz(void);
+int qux(void);
+
+int main() {
+    printf("Hello World %d!\n", foo() + bar() + baz() + qux());
+    return 0;
+}
@@ -0,0 +1,7 @@
+#ifndef QUUX
+#    error "QUUX needs to be defined for qux.c"
+#endif
+
+int qux(void) {
+    return QUUX;
+}
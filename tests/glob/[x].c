@@ -0,0 +1,3 @@
+int bracket(void) {
+    return 4;
+}
@@ -0,0 +1,21 @@
+from ninjapie import Generator, Env, SourcePath
+
+gen = Generator()
+env = Env()
+
+# the directory src/lib is a symlink to real, whose files are found as well
+srcs = env.glob(gen, 'src/**/*.c')
+# brackets match themselves within a class; hidden files and directories are not found
+srcs += env.glob(gen, '[[]x].c')
+# a trailing '/' only matches directories, which are reported with a trailing '/'
+for plugin in env.glob(gen, 'plug/*/'):
+    srcs += env.glob(gen, SourcePath(plugin + '*.c'))
+
+# like the directories below them, the directories in src are reported by '**' as well
+env['CPPPATH'] += [d for d in env.glob(gen, 'src/*/**') if d.endswith('/')]
+
+env['CFLAGS'] += ['-Wall', '-Wextra']
+env.c_exe(gen, out='hello', ins=srcs + ['hello.c'])
+
+gen.write_to_file()
+gen.write_compile_cmds()
@@ -0,0 +1,11 @@
+#!/bin/bash
+source "../helper.sh"
+trap 'rm -rf real/extra.c plug/two src/new' EXIT
+check_build && check_no_work && check_run "./build/hello" || exit 1
+# adding a file to the directory behind the symlink needs to regenerate build.ninja
+echo 'int extra(void) { return 4; }' > real/extra.c
+check_build && grep -q 'src/lib/extra\.c' build/build.ninja && check_no_work || exit 1
+# the same holds for new directories that are matched by a trailing '/' or '**'
+mkdir plug/two src/new
+check_build && grep -q 'plug/two/$' build/.build.files && grep -q 'src/new/$' build/.build.files \
+    && check_no_work
@@ -0,0 +1,14 @@
+#include <stdio.h>
+
+#include "deep.h"
+
+int foo(void);
+int deep(void);
+int lib(void);
+int bracket(void);
+int plugin(void);
+
+int main() {
+    printf("Hello World %d!\n", foo() + deep() + lib() + bracket() + plugin() + DEEP_OFFSET);
+    return 0;
+}
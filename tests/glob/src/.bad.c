@@ -0,0 +1 @@
+#error "hidden files must not be globbed"
@@ -0,0 +1 @@
+#error "hidden directories must not be globbed"
@@ -0,0 +1,3 @@
+int foo(void) {
+    return 1;
+}
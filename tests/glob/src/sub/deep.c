@@ -0,0 +1,3 @@
+int deep(void) {
+    return 2;
+}
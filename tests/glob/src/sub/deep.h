@@ -0,0 +1 @@
+#define DEEP_OFFSET 10
@@ -21,6 +21,13 @@ check_no_work() {
     fi
 }
 
+check_rebuild() {
+    tmp=$(mktemp)
+    NPDEBUG=1 ninjapie -- -v >"$tmp" 2>&1 || exit 1
+    grep "$1" "$tmp" &>/dev/null || exit 1
+    rm -f "$tmp"
+}
+
 check_run() {
     if ! LD_LIBRARY_PATH=build:$LD_LIBRARY_PATH "$1" >/dev/null; then
         exit 1
@@ -2,20 +2,33 @@ from ninjapie import Generator, Env, Rule, BuildEdge, BuildPath, SourcePath
 
 
 class LatexEnv(Env):
+    def __init__(self):
+        super().__init__()
+        # the PDFs that have already been produced by `tex`
+        self._tex_cache = {}
+
     def tex(self, gen, input, deps=None):
-        deps = [] if deps is None else deps
+        deps = tuple(deps or ())
+        vars = {
+            'tex': self['TEX'],
+            'dir': self.build_dir,
+            'texflags': ' '.join(self['TEXFLAGS'])
+        }
+        # the PDF depends on the variables as well, which might have been changed in between
+        key = (gen, self.cur_dir, input, deps, tuple(vars.values()))
+        pdf = self._tex_cache.get(key)
+        if pdf is not None:
+            return pdf
+
         pdf = BuildPath.with_file_ext(self, input, 'pdf')
         gen.add_build(BuildEdge(
             'tex',
             outs=[pdf],
             ins=[SourcePath.new(self, input)],
-            deps=deps,
-            vars={
-                'tex': self['TEX'],
-                'dir': self.build_dir,
-                'texflags': ' '.join(self['TEXFLAGS'])
-            }
+            deps=list(deps),
+            vars=vars
         ))
+        self._tex_cache[key] = pdf
         return pdf
 
 
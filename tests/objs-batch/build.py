@@ -0,0 +1,18 @@
+from ninjapie import Generator, Env
+
+gen = Generator()
+env = Env()
+
+# each file checks that it has been built with the flags of its type
+env['ASFLAGS'] += ['-DLANG_ASM']
+env['CFLAGS'] += ['-Wall', '-Wextra', '-DLANG_C']
+env['CXXFLAGS'] += ['-Wall', '-Wextra', '-DLANG_CXX']
+env['CPPFLAGS'] += ['-DBASE=10']
+eight = env.cc(gen, out='eight.o', ins=['eight.c'])
+
+# with more than 8 input files, Env.objs builds them in bulk via Env.objs_batch
+srcs = ['one.c', 'two.c', 'three.c', 'four.c', 'five.c', 'six.S', 'seven.cc', eight, 'hello.c']
+env.cxx_exe(gen, out='hello', ins=srcs)
+
+gen.write_to_file()
+gen.write_compile_cmds()
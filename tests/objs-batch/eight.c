@@ -0,0 +1,7 @@
+#if !defined(LANG_C) || defined(LANG_CXX) || BASE != 10
+#    error "eight.c needs to be built with the C flags"
+#endif
+
+int eight(void) {
+    return BASE + 8;
+}
@@ -0,0 +1,16 @@
+#include <stdio.h>
+
+int one(void);
+int two(void);
+int three(void);
+int four(void);
+int five(void);
+int six(void);
+int seven(void);
+int eight(void);
+
+int main() {
+    int sum = one() + two() + three() + four() + five() + six() + seven() + eight();
+    printf("Hello World %d!\n", sum);
+    return sum == 8 * 10 + 36 ? 0 : 1;
+}
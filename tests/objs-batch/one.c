@@ -0,0 +1,7 @@
+#if !defined(LANG_C) || defined(LANG_CXX) || BASE != 10
+#    error "one.c needs to be built with the C flags"
+#endif
+
+int one(void) {
+    return BASE + 1;
+}
@@ -0,0 +1,7 @@
+#if !defined(LANG_CXX) || defined(LANG_C) || BASE != 10
+#    error "seven.cc needs to be built with the C++ flags"
+#endif
+
+extern "C" int seven() {
+    return BASE + 7;
+}